@@ -1,72 +1,48 @@
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime
+from urllib.parse import urlencode
+
 import pandas as pd
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.svm import SVC
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.naive_bayes import GaussianNB
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score
+from ml_core import FEATURES, DEFAULT_MODEL_SET, UnknownModelSet, registry, serving
+from db import get_db_connection
+from auth import auth_bp, get_current_user
+from profile import profile_bp
+from admin import admin_bp
+from feedback import feedback_bp, start_refresh
+from explain import explain_batch, format_explanations
+from ratelimit import RateLimiter
 
 # ---------------- Flask App ----------------
 app = Flask(__name__)
-CORS(app)
-
-# ---------------- Load Dataset ----------------
-df = pd.read_csv("Crop_recommendation.csv")
-
-X = df.drop('label', axis=1)
-y = df['label']
-
-# ---------------- Train-Test Split ----------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-# ---------------- Scaling ----------------
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# ---------------- Models ----------------
-# Note: SVC needs probability=True for confidence scores
-rf_model  = RandomForestClassifier(random_state=42)
-dt_model  = DecisionTreeClassifier(random_state=42)
-svm_model = SVC(probability=True, random_state=42)   # ← probability=True
-lr_model  = LogisticRegression(max_iter=1000, random_state=42)
-nb_model  = GaussianNB()
-knn_model = KNeighborsClassifier()
-gb_model  = GradientBoostingClassifier(random_state=42)
-ada_model = AdaBoostClassifier(random_state=42)
-
-models = {
-    "random_forest":      rf_model,
-    "decision_tree":      dt_model,
-    "svm":                svm_model,
-    "logistic_regression": lr_model,
-    "naive_bayes":        nb_model,
-    "knn":                knn_model,
-    "gradient_boost":     gb_model,
-    "adaboost":           ada_model
-}
-
-# ---------------- Train Models ----------------
-for model in models.values():
-    model.fit(X_train_scaled, y_train)
-
-# ---------------- Accuracy Calculation ----------------
-accuracies = {
-    name: round(accuracy_score(y_test, model.predict(X_test_scaled)) * 100, 2)
-    for name, model in models.items()
-}
-
-print("[MODEL ACCURACIES]")
-for k, v in accuracies.items():
+CORS(app, expose_headers=[
+    "ETag", "Link", "X-Next-Cursor",
+    "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After",
+])
+
+app.register_blueprint(auth_bp)
+app.register_blueprint(profile_bp)
+app.register_blueprint(admin_bp)
+app.register_blueprint(feedback_bp)
+
+# Token buckets for /predict, /explain, /login and /forgot_password, plus a
+# cap on concurrent inference. Looked up lazily so tests can patch the user.
+# Behind a reverse proxy set RATE_LIMIT_TRUSTED_PROXIES to the number of hops,
+# or every client shares the proxy's per-IP buckets.
+limiter = RateLimiter(app, user_getter=lambda: get_current_user())
+
+# Models are trained once in ml_core; this module only serves them.
+# Look them up per request: online updates swap entries in `models`.
+
+print(f"[MODEL ACCURACIES] ({serving.accuracy_source})")
+for k, v in serving.reported_accuracies.items():
     print(f"  {k}: {v}%")
+print(f"  best_model: {serving.best_model}")
 
 # ================== GLOBAL THRESHOLD LIMITS ==================
 GLOBAL_THRESHOLDS = {
@@ -99,6 +75,17 @@ def validate_global_thresholds(input_data):
     return len(warnings) == 0, warnings
 
 
+def resolve_model_set(data):
+    """Return (name, ServingModels, None) or (name, None, error response)."""
+    name = data.get("model_set") or DEFAULT_MODEL_SET
+    if not isinstance(name, str):
+        return name, None, (jsonify({"error": "model_set must be a string"}), 400)
+    try:
+        return name, registry.get(name), None
+    except UnknownModelSet:
+        return name, None, (jsonify({"error": f"Unknown model_set: {name}"}), 404)
+
+
 # ---------------- Prediction Endpoint ----------------
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -110,6 +97,12 @@ def predict():
         if r not in data:
             return jsonify({"error": f"Missing field: {r}"}), 400
 
+    # --- Model set (region / dataset version), loaded on first use ---
+    model_set_name, model_set, error = resolve_model_set(data)
+    if error:
+        return error
+    scaler, models = model_set.scaler, model_set.models
+
     # --- Threshold validation ---
     is_valid, threshold_warnings = validate_global_thresholds(data)
 
@@ -122,7 +115,7 @@ def predict():
         float(data['humidity']),
         float(data['ph']),
         float(data['rainfall'])
-    ]], columns=X.columns)
+    ]], columns=FEATURES)
 
     input_scaled = scaler.transform(input_df)
 
@@ -147,8 +140,8 @@ def predict():
         else:
             confidence_scores[name] = None
 
-    # --- Best model (by test accuracy) ---
-    best_model = max(accuracies, key=accuracies.get)
+    # --- Best model (cross-validated when a report exists, else test accuracy) ---
+    best_model = model_set.best_model
 
     # --- Confidence penalty for out-of-range inputs ---
     confidence_penalty = 0
@@ -156,6 +149,7 @@ def predict():
         confidence_penalty = min(len(threshold_warnings) * 5, 20)
 
     # --- Top-3 crop probabilities from Random Forest ---
+    rf_model  = models["random_forest"]
     rf_proba  = rf_model.predict_proba(input_scaled)[0]
     rf_classes = list(rf_model.classes_)
     top3_idx  = rf_proba.argsort()[-3:][::-1]
@@ -164,9 +158,12 @@ def predict():
         for i in top3_idx
     ]
 
-    return jsonify({
+    response = {
         "predictions":         predictions,
-        "accuracies":          accuracies,
+        "model_set":           model_set_name,
+        "accuracies":          model_set.reported_accuracies,
+        "accuracy_source":     model_set.accuracy_source,
+        "cv_metrics":          model_set.cv_metrics,
         "best_model":          best_model,
         "recommended_crop":    predictions[best_model],
 
@@ -180,9 +177,180 @@ def predict():
         "threshold_status":    "ok" if is_valid else "warning",
         "threshold_warnings":  threshold_warnings,
         "confidence_penalty":  confidence_penalty
+    }
+
+    # --- Optional per-feature contributions for the recommended crop ---
+    if data.get("explain"):
+        contributions = explain_batch(input_scaled, [predictions[best_model]], model_set)
+        response["explanation"] = format_explanations(contributions, ranked_by=best_model)[0]
+
+    return jsonify(response)
+
+
+# ---------------- Batch Explanation Endpoint ----------------
+MAX_EXPLAIN_BATCH = 1000
+
+@app.route('/explain', methods=['POST'])
+def explain():
+    data    = request.json or {}
+    samples = data.get("samples")
+    if not isinstance(samples, list) or not samples:
+        return jsonify({"error": "samples must be a non-empty list"}), 400
+    if len(samples) > MAX_EXPLAIN_BATCH:
+        return jsonify({"error": f"At most {MAX_EXPLAIN_BATCH} samples per request"}), 400
+
+    try:
+        input_df = pd.DataFrame(
+            [[float(s[f]) for f in FEATURES] for s in samples], columns=FEATURES
+        )
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": f"Each sample needs numeric {', '.join(FEATURES)}"}), 400
+
+    _, model_set, error = resolve_model_set(data)
+    if error:
+        return error
+
+    input_scaled = model_set.scaler.transform(input_df)
+    best_model   = model_set.best_model
+    crops        = model_set.models[best_model].predict(input_scaled)
+    explanations = format_explanations(explain_batch(input_scaled, crops, model_set), ranked_by=best_model)
+
+    return jsonify([
+        {"recommended_crop": crop, "explanation": explanation}
+        for crop, explanation in zip(crops, explanations)
+    ])
+
+
+# ---------------- Model Sets ----------------
+@app.route('/model_sets')
+def model_sets():
+    return jsonify({
+        "available":    registry.available(),
+        "resident":     registry.resident(),
+        "max_resident": registry.max_resident,
     })
 
 
+# ---------------- Prediction History ----------------
+HISTORY_PAGE_SIZE     = int(os.environ.get("HISTORY_PAGE_SIZE", 50))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", 200))
+
+HISTORY_COLUMNS = (
+    "id, nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall, "
+    "predicted_crop, best_model, created_at"
+)
+
+
+# Per-user counter bumped by triggers on every insert, update or delete in
+# `predictions`, whoever makes it; see sql/history_indexes.sql.
+HISTORY_VERSION_SQL = "SELECT version FROM prediction_history_versions WHERE user_id = %s"
+
+
+def _history_etag(user_id, version):
+    key = f"{user_id}:{version}:{request.query_string.decode()}"
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def _encode_cursor(row):
+    created_at = row["created_at"]
+    if hasattr(created_at, "isoformat"):
+        created_at = created_at.isoformat()
+    payload = json.dumps({"c": created_at, "i": row["id"]})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return datetime.fromisoformat(payload["c"]), int(payload["i"])
+
+
+@app.route('/history/<int:user_id>')
+def history(user_id):
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+    if user.get("user_id") != user_id and not user.get("is_admin"):
+        return jsonify({"error": "Forbidden"}), 403
+
+    # --- Query parameters (all filters are pushed into SQL) ---
+    # Without limit or cursor the full history is returned, as before paging.
+    paged = "limit" in request.args or "cursor" in request.args
+    try:
+        limit = min(max(int(request.args.get("limit", HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+        date_from = request.args.get("from")
+        date_to   = request.args.get("to")
+        date_from = datetime.fromisoformat(date_from) if date_from else None
+        date_to   = datetime.fromisoformat(date_to) if date_to else None
+        cursor    = request.args.get("cursor")
+        cursor    = _decode_cursor(cursor) if cursor else None
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"error": "Invalid limit, from, to or cursor parameter"}), 400
+    crop = (request.args.get("crop") or "").strip().lower()
+
+    # Served by idx_predictions_user_created (user_id, created_at, id);
+    # see sql/history_indexes.sql.
+    where, params = ["user_id = %s"], [user_id]
+    if date_from:
+        where.append("created_at >= %s")
+        params.append(date_from)
+    if date_to:
+        where.append("created_at < %s")
+        params.append(date_to)
+    if crop:
+        where.append("predicted_crop = %s")
+        params.append(crop)
+    if cursor:
+        where.append("(created_at < %s OR (created_at = %s AND id < %s))")
+        params.extend([cursor[0], cursor[0], cursor[1]])
+    sql = (
+        f"SELECT {HISTORY_COLUMNS} FROM predictions WHERE {' AND '.join(where)} "
+        f"ORDER BY created_at DESC, id DESC"
+    )
+    if paged:
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+
+    # A 304 costs one primary-key lookup. The version is read before the
+    # page, so a write in between can only make the ETag too old (a later
+    # 200), never mark changed rows as unchanged.
+    try:
+        conn = get_db_connection()
+        cur  = conn.cursor(dictionary=True)
+        cur.execute(HISTORY_VERSION_SQL, (user_id,))
+        version = cur.fetchone()
+        etag = _history_etag(user_id, version["version"] if version else 0)
+        if request.if_none_match.contains(etag):
+            cur.close()
+            conn.close()
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        cur.execute(sql, tuple(params))
+        rows = cur.fetchall()
+        cur.close()
+        conn.close()
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+    next_cursor = None
+    if paged and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1])
+    for row in rows:
+        if row.get("created_at") and hasattr(row["created_at"], "isoformat"):
+            row["created_at"] = row["created_at"].isoformat()
+
+    response = jsonify(rows)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    if next_cursor:
+        args = {**request.args.to_dict(), "cursor": next_cursor, "limit": limit}
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    return response
+
+
 # ---------------- Health Check ----------------
 @app.route('/')
 def home():
@@ -191,4 +359,8 @@ def home():
 
 # ---------------- Run App ----------------
 if __name__ == '__main__':
+    # Replay stored feedback before serving. Under a WSGI server, call
+    # feedback.start_refresh() from the worker start hook; otherwise the
+    # first /feedback or /feedback/metrics request triggers it.
+    start_refresh()
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
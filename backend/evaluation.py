@@ -0,0 +1,204 @@
+"""Cross-validated evaluation of the crop models.
+
+Run ``python evaluation.py`` to score every model with stratified k-fold
+CV (folds run in parallel), measure inference latency, and write
+model_report.json. ml_core picks ``best_model`` from that report when its
+dataset hash matches the CSV being served.
+"""
+import hashlib
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, confusion_matrix, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+BASE_DIR    = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.environ.get("CROP_MODEL_REPORT", os.path.join(BASE_DIR, "model_report.json"))
+CACHE_DIR   = os.environ.get("CROP_EVAL_CACHE", os.path.join(BASE_DIR, ".eval_cache"))
+
+LATENCY_REPEATS = 20
+
+
+def dataset_hash(csv_path):
+    with open(csv_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def params_hash(model):
+    params = sorted((k, repr(v)) for k, v in model.get_params().items())
+    return hashlib.sha256(f"{type(model).__name__}:{params}".encode()).hexdigest()[:16]
+
+
+def _run_fold(model, X, y, train_idx, test_idx):
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train_idx])
+    X_test  = scaler.transform(X[test_idx])
+    model = clone(model)
+    model.fit(X_train, y[train_idx])
+    return {"y_pred": model.predict(X_test).tolist()}
+
+
+def measure_latency(model, X, y, train_idx, test_idx, repeats=LATENCY_REPEATS):
+    """Fit and predict timings for one model, meant to run serially on an idle
+    machine; never cached, since they depend on the hardware."""
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X[train_idx])
+    X_test  = scaler.transform(X[test_idx])
+
+    model = clone(model)
+    start = time.perf_counter()
+    model.fit(X_train, y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    model.predict(X_test[:1])   # warm-up
+    start = time.perf_counter()
+    model.predict(X_test)
+    batch_ms = (time.perf_counter() - start) * 1000 / len(test_idx)
+
+    single = []
+    for i in range(repeats):
+        row = X_test[i % len(X_test)][None, :]
+        start = time.perf_counter()
+        model.predict(row)
+        single.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "fit_s":            round(fit_s, 4),
+        "batch_ms_per_row": round(batch_ms, 4),
+        "single_row_ms":    round(float(np.median(single)), 4),
+    }
+
+
+def _cached_fold(cache_key, model, X, y, train_idx, test_idx):
+    path = os.path.join(CACHE_DIR, f"{cache_key}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    result = _run_fold(model, X, y, train_idx, test_idx)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(result, f)
+    os.replace(tmp, path)
+    return result
+
+
+def _summarise(y_true_folds, fold_results, labels, latency):
+    accs = [accuracy_score(t, r["y_pred"]) * 100 for t, r in zip(y_true_folds, fold_results)]
+    f1s  = [f1_score(t, r["y_pred"], average="weighted", zero_division=0) * 100
+            for t, r in zip(y_true_folds, fold_results)]
+    matrix = sum(confusion_matrix(t, r["y_pred"], labels=labels)
+                 for t, r in zip(y_true_folds, fold_results))
+    per_class = {}
+    for i, label in enumerate(labels):
+        support = int(matrix[i].sum())
+        confused = {labels[j]: int(matrix[i, j]) for j in np.nonzero(matrix[i])[0] if j != i}
+        per_class[label] = {
+            "support":       support,
+            "recall":        round(float(matrix[i, i]) / support * 100, 2) if support else None,
+            "confused_with": confused,
+        }
+    return {
+        "accuracy_mean":    round(float(np.mean(accs)), 2),
+        "accuracy_std":     round(float(np.std(accs)), 2),
+        "accuracy_var":     round(float(np.var(accs)), 4),
+        "f1_mean":          round(float(np.mean(f1s)), 2),
+        "f1_std":           round(float(np.std(f1s)), 2),
+        "fold_accuracies":  [round(a, 2) for a in accs],
+        **latency,
+        "per_class":        per_class,
+        "labels":           list(labels),
+        "confusion":        matrix.tolist(),
+    }
+
+
+def evaluate_models(csv_path=None, models=None, k=5, n_jobs=-1, seed=42):
+    """k-fold CV for every model, folds cached by dataset hash, model params
+    and scikit-learn version. Latency is measured afterwards in one serial,
+    uncached pass so parallel folds and other machines don't skew it."""
+    from ml_core import CSV_PATH, FEATURES, build_models
+    csv_path = csv_path or CSV_PATH
+    models   = models or build_models()
+
+    df = pd.read_csv(csv_path)
+    X  = df[FEATURES].to_numpy(dtype=np.float64)
+    y  = df["label"].to_numpy()
+    labels = sorted(set(y))
+    data_key = dataset_hash(csv_path)
+    folds = list(StratifiedKFold(n_splits=k, shuffle=True, random_state=seed).split(X, y))
+
+    jobs = [(name, i) for name in models for i in range(len(folds))]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_cached_fold)(
+            f"{data_key[:16]}-{params_hash(models[name])}-k{k}s{seed}f{i}-sk{sklearn.__version__}",
+            models[name], X, y, *folds[i],
+        )
+        for name, i in jobs
+    )
+    by_model = {name: [] for name in models}
+    for (name, _), result in zip(jobs, results):
+        by_model[name].append(result)
+
+    latency = {name: measure_latency(model, X, y, *folds[0]) for name, model in models.items()}
+
+    y_true_folds = [y[test_idx] for _, test_idx in folds]
+    return {
+        "dataset_hash":    data_key,
+        "k":               k,
+        "seed":            seed,
+        "sklearn_version": sklearn.__version__,
+        "models": {
+            name: _summarise(y_true_folds, res, labels, latency[name]) for name, res in by_model.items()
+        },
+    }
+
+
+def select_best_model(report, tolerance=0.5):
+    """Highest lower-bound accuracy (mean - std); among models within
+    `tolerance` points of it, the one with the lowest single-row latency."""
+    scores = {name: m["accuracy_mean"] - m["accuracy_std"] for name, m in report["models"].items()}
+    top = max(scores.values())
+    candidates = [name for name, score in scores.items() if score >= top - tolerance]
+    return min(candidates, key=lambda name: report["models"][name]["single_row_ms"])
+
+
+def save_report(report, path=REPORT_PATH):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def load_report(csv_path, path=REPORT_PATH):
+    """Return the saved report if it was produced from this exact CSV, else None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report if report.get("dataset_hash") == dataset_hash(csv_path) else None
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Cross-validate the crop models.")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=-1)
+    args = parser.parse_args()
+
+    report = evaluate_models(k=args.folds, n_jobs=args.jobs)
+    report["best_model"] = select_best_model(report)
+    save_report(report)
+
+    print(f"[CV {report['k']}-FOLD]")
+    for name, m in report["models"].items():
+        print(f"  {name}: {m['accuracy_mean']}% ± {m['accuracy_std']}  ({m['single_row_ms']} ms/row)")
+    print(f"  best_model: {report['best_model']}")
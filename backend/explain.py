@@ -0,0 +1,141 @@
+import weakref
+
+import numpy as np
+
+from ml_core import serving
+
+TREE_MODELS   = ("random_forest", "decision_tree")
+LINEAR_MODELS = ("logistic_regression",)
+NB_MODELS     = ("naive_bayes",)
+EXPLAINED_MODELS = TREE_MODELS + LINEAR_MODELS + NB_MODELS
+
+# Per-tree path tables, rebuilt automatically when online updates swap a model.
+_tree_tables = weakref.WeakKeyDictionary()
+
+
+def _tree_table(tree):
+    """For every node: the feature split on by its parent, the change in class
+    probabilities caused by that split, and (for leaves) the non-root nodes
+    on the path from the root. Root has feature -1."""
+    t = tree.tree_
+    value = t.value[:, 0, :]
+    prob = value / value.sum(axis=1, keepdims=True)
+    parent = np.full(t.node_count, -1)
+    for children in (t.children_left, t.children_right):
+        inner = children >= 0
+        parent[children[inner]] = np.nonzero(inner)[0]
+    has_parent = parent >= 0
+    feature = np.full(t.node_count, -1)
+    feature[has_parent] = t.feature[parent[has_parent]]
+    delta = np.zeros_like(prob)
+    delta[has_parent] = prob[has_parent] - prob[parent[has_parent]]
+
+    # Node ids are assigned parent-first, so one forward pass builds every path.
+    paths = [[] for _ in range(t.node_count)]
+    for node in range(1, t.node_count):
+        paths[node] = paths[parent[node]] + [node]
+    is_leaf = t.children_left < 0
+    leaf_paths = [paths[node] if is_leaf[node] else [] for node in range(t.node_count)]
+    return feature, delta, prob[0], leaf_paths
+
+
+def _tables(model):
+    """Node tables for every tree, concatenated with global node ids."""
+    if model not in _tree_tables:
+        trees = model.estimators_ if hasattr(model, "estimators_") else [model]
+        tables = [_tree_table(tree) for tree in trees]
+        offsets = np.cumsum([0] + [len(table[0]) for table in tables[:-1]])
+        lengths, path_nodes = [], []
+        for offset, (_, _, _, leaf_paths) in zip(offsets, tables):
+            for path in leaf_paths:
+                lengths.append(len(path))
+                path_nodes.extend(node + offset for node in path)
+        _tree_tables[model] = (
+            [tree.tree_ for tree in trees],
+            offsets,
+            np.concatenate([[0], np.cumsum(lengths)]),
+            np.array(path_nodes, dtype=np.intp),
+            np.concatenate([table[0] for table in tables]),
+            np.vstack([table[1] for table in tables]) / len(trees),
+            np.mean([table[2] for table in tables], axis=0),
+        )
+    return _tree_tables[model]
+
+
+def tree_contributions(model, X, target_idx):
+    """Exact path attribution (Saabas): bias + contributions.sum(1) equals the
+    model's predicted probability of the target class for each row."""
+    n, n_features = X.shape
+    trees, offsets, path_ptr, path_nodes, feature, delta, root = _tables(model)
+    # Low-level apply() is far cheaper than building per-tree decision_path
+    # matrices; the cached leaf paths give the same node sets.
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    leaves = np.stack([tree.apply(X32) + offset for tree, offset in zip(trees, offsets)], axis=1).ravel()
+    starts = path_ptr[leaves]
+    lengths = path_ptr[leaves + 1] - starts
+    rows = np.repeat(np.arange(n).repeat(len(trees)), lengths)
+    nodes = path_nodes[np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())]
+    contrib = np.bincount(rows * n_features + feature[nodes],
+                          weights=delta[nodes, target_idx[rows]],
+                          minlength=n * n_features)
+    return contrib.reshape(n, n_features), root[target_idx]
+
+
+def linear_contributions(model, X, target_idx, background):
+    """coef * (x - background): each feature's share of the target-class logit
+    relative to a typical (median) training sample."""
+    return model.coef_[target_idx] * (X - background)
+
+
+def naive_bayes_contributions(model, X, target_idx):
+    """Per-feature log-likelihood of the target class relative to the
+    prior-weighted average over all classes."""
+    theta, var = model.theta_, model.var_
+    loglik = -0.5 * (np.log(2 * np.pi * var)[None] + (X[:, None, :] - theta[None]) ** 2 / var[None])
+    baseline = np.einsum("k,nkf->nf", model.class_prior_, loglik)
+    return loglik[np.arange(len(X)), target_idx] - baseline
+
+
+def explain_batch(X_scaled, target_crops, model_set=None):
+    """Per-feature contributions towards target_crops[i] for every row of X_scaled.
+
+    model_set is a ServingModels container (default: the default set).
+    Returns {model_name: ndarray of shape (n_rows, n_features)}.
+    """
+    model_set = model_set or serving
+    models = model_set.models
+    target_crops = np.asarray(target_crops)
+    out = {}
+    for name in EXPLAINED_MODELS:
+        model = models[name]
+        target_idx = np.searchsorted(model.classes_, target_crops)
+        if name in TREE_MODELS:
+            out[name], _ = tree_contributions(model, X_scaled, target_idx)
+        elif name in LINEAR_MODELS:
+            out[name] = linear_contributions(model, X_scaled, target_idx, model_set.background["median"])
+        else:
+            out[name] = naive_bayes_contributions(model, X_scaled, target_idx)
+    return out
+
+
+def format_explanations(contributions, feature_names=None, ranked_by=None):
+    """Turn explain_batch output into one JSON-ready dict per row.
+
+    top_features ranks features by the contributions of `ranked_by`, which
+    should be the model that chose the crop; models without an explainer
+    fall back to the RandomForest. The model used is reported as ranked_by.
+    """
+    feature_names = feature_names or serving.feature_names
+    if ranked_by not in contributions:
+        ranked_by = "random_forest"
+    n = len(next(iter(contributions.values())))
+    rows = []
+    for i in range(n):
+        row = {}
+        for name, values in contributions.items():
+            row[name] = {f: round(float(v), 4) for f, v in zip(feature_names, values[i])}
+        ranking = contributions[ranked_by][i]
+        row["top_features"] = [feature_names[j] for j in np.argsort(-ranking)[:3]]
+        row["ranked_by"] = ranked_by
+        rows.append(row)
+    return rows
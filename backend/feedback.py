@@ -0,0 +1,96 @@
+import threading
+from flask import Blueprint, request, jsonify
+from db import get_db_connection
+from auth import get_current_user
+from ml_core import FEATURES
+from online import learner
+
+feedback_bp = Blueprint("feedback", __name__)
+
+
+def _iter_feedback():
+    # A generator, so the query runs inside learner.refresh(): a failed load
+    # still counts as a refresh attempt and is retried at most once a minute.
+    conn = get_db_connection()
+    cur  = conn.cursor()
+    cur.execute(
+        "SELECT id, nitrogen, phosphorus, potassium, temperature, humidity, ph, rainfall, actual_crop "
+        "FROM crop_feedback"
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    for row in rows:
+        yield row[0], list(row[1:8]), row[8]
+
+
+def _refresh_from_db(refit_scheduled=True):
+    try:
+        learner.refresh(_iter_feedback(), refit_scheduled=refit_scheduled)
+    except Exception as e:
+        print(f"[FEEDBACK] scheduled refresh failed: {e}")
+
+
+def start_refresh():
+    """Refresh in the background. Before the first successful replay this
+    only replays stored feedback, without refitting the scheduled models."""
+    threading.Thread(target=_refresh_from_db, args=(learner.replayed,), daemon=True).start()
+
+
+@feedback_bp.route("/feedback", methods=["POST"])
+def submit_feedback():
+    user = get_current_user()
+    if not user:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(force=True) or {}
+    missing = [f for f in FEATURES + ["actual_crop"] if f not in data]
+    if missing:
+        return jsonify({"error": f"Missing fields: {', '.join(missing)}"}), 400
+    try:
+        features = [float(data[f]) for f in FEATURES]
+    except (TypeError, ValueError):
+        return jsonify({"error": "Soil and climate fields must be numeric"}), 400
+
+    actual_crop = str(data["actual_crop"]).strip().lower()
+    if actual_crop not in learner.classes:
+        return jsonify({"error": f"Unknown crop: {actual_crop}"}), 400
+    prediction_id = data.get("prediction_id")
+
+    try:
+        conn = get_db_connection()
+        cur  = conn.cursor()
+        cur.execute(
+            "INSERT INTO crop_feedback (user_id, prediction_id, nitrogen, phosphorus, potassium, "
+            "temperature, humidity, ph, rainfall, actual_crop) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            (user["user_id"], prediction_id, *features, actual_crop)
+        )
+        conn.commit()
+        feedback_id = cur.lastrowid
+        cur.close()
+        conn.close()
+    except Exception as e:
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+
+    batch_applied = learner.add(features, actual_crop, feedback_id)
+    if learner.refresh_due():
+        start_refresh()
+
+    return jsonify({
+        "message":       "Feedback recorded",
+        "id":            feedback_id,
+        "holdout":       learner.is_holdout(feedback_id),
+        "batch_applied": batch_applied,
+    })
+
+
+@feedback_bp.route("/feedback/metrics")
+def feedback_metrics():
+    if learner.refresh_due():
+        start_refresh()
+    return jsonify({
+        "rolling_holdout":       learner.rolling_metrics,
+        "samples_since_refresh": learner.samples_since_refresh,
+        "replayed":              learner.replayed,
+    })
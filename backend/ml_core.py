@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, AdaBoostClassifier
 from sklearn.tree import DecisionTreeClassifier
@@ -8,41 +9,54 @@ from sklearn.linear_model import LogisticRegression
 from sklearn.naive_bayes import GaussianNB
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.metrics import accuracy_score, classification_report
-from collections import Counter
+from collections import Counter, OrderedDict
 import os
+import pickle
+import re
+import threading
+
+from evaluation import load_report, select_best_model
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, "Crop_recommendation.csv")
 
-try:
-    df = pd.read_csv(CSV_PATH)
-except FileNotFoundError:
-    raise RuntimeError(f"Dataset not found at {CSV_PATH}.")
-
-X = df.drop('label', axis=1)
-y = df['label']
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled  = scaler.transform(X_test)
-
-models = {
-    "random_forest":        RandomForestClassifier(random_state=42),
-    "decision_tree":        DecisionTreeClassifier(random_state=42),
-    "svm":                  SVC(random_state=42),
-    "logistic_regression":  LogisticRegression(max_iter=1000, random_state=42),
-    "naive_bayes":          GaussianNB(),
-    "knn":                  KNeighborsClassifier(),
-    "gradient_boost":       GradientBoostingClassifier(random_state=42),
-    "adaboost":             AdaBoostClassifier(random_state=42),
+FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Regional / versioned model sets: <name>.pkl (pickled ServingModels), built
+# offline with `python ml_core.py <name> <csv>`. Never trained in a request.
+MODEL_STORE   = os.environ.get("CROP_MODEL_STORE", os.path.join(BASE_DIR, "model_sets"))
+MAX_RESIDENT  = int(os.environ.get("CROP_MODEL_SETS_RESIDENT", 4))
+DEFAULT_MODEL_SET = "default"
+
+# Set CROP_DIAGNOSTIC_MODE=1 to keep the training frames reachable via
+# serving.training (for notebooks / debugging). Off by default so the
+# serving process only holds what inference needs.
+DIAGNOSTIC_MODE = os.environ.get("CROP_DIAGNOSTIC_MODE", "").lower() in ("1", "true", "yes")
+
+# Fitted attributes that are safe to store as float32. Each cast is only
+# kept if predictions on the held-out split are unchanged.
+FLOAT32_ATTRS = {
+    "logistic_regression": ("coef_", "intercept_"),
+    "naive_bayes":         ("theta_", "var_", "class_prior_"),
 }
+SCALER_FLOAT32_ATTRS = ("mean_", "scale_", "var_")
+
+
+def build_models():
+    # Note: SVC needs probability=True for the /predict confidence scores
+    return {
+        "random_forest":        RandomForestClassifier(random_state=42),
+        "decision_tree":        DecisionTreeClassifier(random_state=42),
+        "svm":                  SVC(probability=True, random_state=42),
+        "logistic_regression":  LogisticRegression(max_iter=1000, random_state=42),
+        "naive_bayes":          GaussianNB(),
+        "knn":                  KNeighborsClassifier(),
+        "gradient_boost":       GradientBoostingClassifier(random_state=42),
+        "adaboost":             AdaBoostClassifier(random_state=42),
+    }
 
-for model in models.values():
-    model.fit(X_train_scaled, y_train)
 
-# Precompute all metrics at startup
-def _compute_metrics(name, model):
+def _compute_metrics(model, X_test_scaled, y_test):
     y_pred = model.predict(X_test_scaled)
     report = classification_report(y_test, y_pred, output_dict=True, zero_division=0)
     return {
@@ -52,16 +66,305 @@ def _compute_metrics(name, model):
         "f1":        round(report["weighted avg"]["f1-score"] * 100, 2),
     }
 
-model_metrics = {name: _compute_metrics(name, model) for name, model in models.items()}
-accuracies = {name: model_metrics[name]["accuracy"] for name in models}
 
+def _nbytes(obj):
+    """Approximate resident size of a training frame, array or fitted model."""
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    return len(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _cast_float32(obj, attrs):
+    for attr in attrs:
+        value = getattr(obj, attr, None)
+        if isinstance(value, np.ndarray) and value.dtype == np.float64:
+            setattr(obj, attr, value.astype(np.float32))
+
+
+def _compact(scaler, models, X_test, y_test):
+    """Downcast small fitted arrays to float32 where held-out predictions don't move.
+
+    Returns {object: {"before": bytes, "after": bytes}} for every object touched.
+    """
+    sizes = {"scaler": {"before": _nbytes(scaler)}}
+    sizes.update({f"models.{name}": {"before": _nbytes(models[name])} for name in FLOAT32_ATTRS})
+    X_test_scaled = scaler.transform(X_test)
+    baseline = {name: model.predict(X_test_scaled) for name, model in models.items()}
+
+    backup = {attr: getattr(scaler, attr) for attr in SCALER_FLOAT32_ATTRS}
+    _cast_float32(scaler, SCALER_FLOAT32_ATTRS)
+    X_test_scaled = scaler.transform(X_test)
+    if any((models[name].predict(X_test_scaled) != baseline[name]).any() for name in models):
+        for attr, value in backup.items():
+            setattr(scaler, attr, value)
+        X_test_scaled = scaler.transform(X_test)
+
+    for name, attrs in FLOAT32_ATTRS.items():
+        model = models[name]
+        backup = {attr: getattr(model, attr) for attr in attrs if hasattr(model, attr)}
+        _cast_float32(model, attrs)
+        if (model.predict(X_test_scaled) != baseline[name]).any():
+            for attr, value in backup.items():
+                setattr(model, attr, value)
+
+    sizes["scaler"]["after"] = _nbytes(scaler)
+    for name in FLOAT32_ATTRS:
+        sizes[f"models.{name}"]["after"] = _nbytes(models[name])
+    return sizes
+
+
+class ServingModels:
+    """Inference-time state: the scaler, the fitted models and their test metrics.
+
+    The training frames are dropped once metrics are computed unless the
+    container was built with keep_training_data=True, in which case they
+    are available as ``training`` (a dict of DataFrames/arrays).
+    ``background`` keeps the per-feature median of the scaled training set,
+    the reference point for linear explanations (the mean is zero after
+    scaling, so it would add nothing). ``best_model`` comes from the cross-validated report
+    (see evaluation.py) when one matches the dataset, else from the split
+    accuracies.
+    """
+
+    def __init__(self, scaler, models, model_metrics, feature_names=FEATURES,
+                 training=None, released=None, background=None, cv_report=None,
+                 compaction=None):
+        self.scaler = scaler
+        self.models = models
+        self.model_metrics = model_metrics
+        self.accuracies = {name: model_metrics[name]["accuracy"] for name in models}
+        self.feature_names = list(feature_names)
+        self.training = training
+        self.released = released or {}
+        self.compaction = compaction or {}
+        self.background = background or {}
+        self.cv_metrics = None
+        self.best_model = max(self.accuracies, key=self.accuracies.get)
+        if cv_report and set(cv_report["models"]) == set(models):
+            self.cv_metrics = {
+                name: {k: v for k, v in m.items() if k not in ("labels", "confusion", "per_class")}
+                for name, m in cv_report["models"].items()
+            }
+            self.best_model = cv_report.get("best_model") or select_best_model(cv_report)
+
+    @property
+    def reported_accuracies(self):
+        """Accuracies to show next to best_model: CV means when best_model came
+        from the CV report, so both are based on the same numbers."""
+        if self.cv_metrics:
+            return {name: self.cv_metrics[name]["accuracy_mean"] for name in self.models}
+        return self.accuracies
+
+    @property
+    def accuracy_source(self):
+        return "cross_validation" if self.cv_metrics else "holdout_split"
+
+    def memory_report(self):
+        """Per-object sizes (bytes) of what is retained and what was released at startup.
+
+        ``compaction`` has the before/after size of every object the float32
+        pass touched. ``retained_training_data`` lists training samples still
+        held inside models: KNN keeps its whole training split (plus any
+        feedback) as the search index, so it is the one copy not released.
+        """
+        retained = {"scaler": _nbytes(self.scaler), "background": _nbytes(self.background)}
+        for name, model in self.models.items():
+            retained[f"models.{name}"] = _nbytes(model)
+        for name, obj in (self.training or {}).items():
+            retained[f"training.{name}"] = _nbytes(obj)
+        retained_training_data = {}
+        knn = self.models.get("knn")
+        if knn is not None and hasattr(knn, "_fit_X"):
+            retained_training_data["models.knn._fit_X"] = _nbytes(knn._fit_X)
+            retained_training_data["models.knn._y"] = _nbytes(knn._y)
+        return {
+            "retained":               retained,
+            "released":               dict(self.released),
+            "compaction":             {name: dict(sizes) for name, sizes in self.compaction.items()},
+            "retained_training_data": retained_training_data,
+            "retained_total":         sum(retained.values()),
+            "released_total":         sum(self.released.values()),
+        }
+
+
+def train_serving_models(csv_path=CSV_PATH, keep_training_data=DIAGNOSTIC_MODE):
+    try:
+        df = pd.read_csv(csv_path)
+    except FileNotFoundError:
+        raise RuntimeError(f"Dataset not found at {csv_path}.")
+
+    X = df[FEATURES]
+    y = df['label']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled  = scaler.transform(X_test)
+
+    models = build_models()
+    for model in models.values():
+        model.fit(X_train_scaled, y_train)
+
+    # Precompute all metrics at startup
+    model_metrics = {name: _compute_metrics(model, X_test_scaled, y_test) for name, model in models.items()}
 
-def predict_crop(input_df):
-    scaled = scaler.transform(input_df)
-    preds = {name: model.predict(scaled)[0] for name, model in models.items()}
+    background = {
+        "median": np.median(X_train_scaled, axis=0).astype(np.float32),
+    }
+
+    compaction = None
+    if not keep_training_data:
+        compaction = _compact(scaler, models, X_test, y_test)
+
+    training = {
+        "df": df, "X": X, "y": y,
+        "X_train": X_train, "X_test": X_test, "y_train": y_train, "y_test": y_test,
+        "X_train_scaled": X_train_scaled, "X_test_scaled": X_test_scaled,
+    }
+    cv_report = load_report(csv_path)
+    if keep_training_data:
+        return ServingModels(scaler, models, model_metrics, training=training,
+                             background=background, cv_report=cv_report)
+
+    released = {name: _nbytes(obj) for name, obj in training.items()}
+    return ServingModels(scaler, models, model_metrics, released=released,
+                         background=background, cv_report=cv_report, compaction=compaction)
+
+
+class UnknownModelSet(KeyError):
+    pass
+
+
+class ModelRegistry:
+    """Model sets keyed by region or dataset version, loaded on first use.
+
+    The default set (trained from CSV_PATH at import) is always resident.
+    Other sets are read from MODEL_STORE and kept in an LRU of at most
+    `max_resident` entries; the least recently used set is dropped when a
+    new one is loaded.
+    """
+
+    NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+    def __init__(self, default, store=MODEL_STORE, max_resident=MAX_RESIDENT):
+        self.default = default
+        self.store = store
+        self.max_resident = max_resident
+        self._resident = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def _path(self, name):
+        return os.path.join(self.store, f"{name}.pkl")
+
+    def available(self):
+        names = {DEFAULT_MODEL_SET}
+        if os.path.isdir(self.store):
+            for filename in os.listdir(self.store):
+                stem, ext = os.path.splitext(filename)
+                if ext == ".pkl" and self.NAME_RE.match(stem):
+                    names.add(stem)
+        return sorted(names)
+
+    def resident(self):
+        return [DEFAULT_MODEL_SET] + list(self._resident)
+
+    def get(self, name=None):
+        if not name or name == DEFAULT_MODEL_SET:
+            return self.default
+        if not isinstance(name, str) or not self.NAME_RE.match(name):
+            raise UnknownModelSet(name)
+
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                return self._resident[name]
+        # Checked before any per-name state is created, so unknown names
+        # cost nothing to remember.
+        if not os.path.exists(self._path(name)):
+            raise UnknownModelSet(name)
+
+        while True:
+            with self._lock:
+                if name in self._resident:
+                    self._resident.move_to_end(name)
+                    return self._resident[name]
+                # One loader per set. Its lock is created already held and is
+                # only removed by that loader, so waiters never load.
+                load_lock = self._loading.get(name)
+                if load_lock is None:
+                    load_lock = self._loading[name] = threading.Lock()
+                    load_lock.acquire()
+                    break
+            # Wait for the current loader, then look again: the set may
+            # already have been evicted, in which case one waiter takes over.
+            with load_lock:
+                pass
+
+        try:
+            model_set = self._load(name)
+            with self._lock:
+                self._resident[name] = model_set
+                while len(self._resident) > self.max_resident:
+                    self._resident.popitem(last=False)
+            return model_set
+        finally:
+            with self._lock:
+                if self._loading.get(name) is load_lock:
+                    del self._loading[name]
+            load_lock.release()
+
+    def _load(self, name):
+        try:
+            with open(self._path(name), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            raise UnknownModelSet(name)
+
+
+def save_model_set(model_set, name, store=MODEL_STORE):
+    os.makedirs(store, exist_ok=True)
+    path = os.path.join(store, f"{name}.pkl")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(model_set, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return path
+
+
+serving = train_serving_models()
+registry = ModelRegistry(serving)
+
+scaler        = serving.scaler
+models        = serving.models
+model_metrics = serving.model_metrics
+accuracies    = serving.accuracies
+
+
+def predict_crop(input_df, model_set=None):
+    model_set = registry.get(model_set)
+    scaled = model_set.scaler.transform(input_df)
+    preds = {name: model.predict(scaled)[0] for name, model in model_set.models.items()}
     vote_counts = Counter(preds.values())
     max_votes = max(vote_counts.values())
     top_crops = [crop for crop, count in vote_counts.items() if count == max_votes]
-    best_model = max(accuracies, key=accuracies.get)
+    best_model = model_set.best_model
     recommended_crop = top_crops[0] if len(top_crops) == 1 else preds[best_model]
-    return preds, accuracies, best_model, recommended_crop, dict(vote_counts)
+    return preds, model_set.reported_accuracies, best_model, recommended_crop, dict(vote_counts)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a regional model set into the artifact store.")
+    parser.add_argument("name", help="model set name, e.g. punjab or v2024-06")
+    parser.add_argument("csv", help="dataset with the same columns as Crop_recommendation.csv")
+    args = parser.parse_args()
+    if not ModelRegistry.NAME_RE.match(args.name) or args.name == DEFAULT_MODEL_SET:
+        raise SystemExit(f"Invalid model set name: {args.name}")
+    # Pickle via the importable module, not __main__, so the app can load it.
+    import ml_core
+    print(ml_core.save_model_set(ml_core.train_serving_models(args.csv, keep_training_data=False), args.name))
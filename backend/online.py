@@ -0,0 +1,220 @@
+import copy
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+
+from ml_core import CSV_PATH, FEATURES, serving
+
+# Updated per micro-batch; the rest only change when refresh() refits everything.
+INCREMENTAL_MODELS = ("naive_bayes", "logistic_regression", "knn")
+SCHEDULED_MODELS   = ("random_forest", "decision_tree", "svm", "gradient_boost", "adaboost")
+
+BATCH_SIZE      = int(os.environ.get("FEEDBACK_BATCH_SIZE", 16))
+HOLDOUT_EVERY   = int(os.environ.get("FEEDBACK_HOLDOUT_EVERY", 5))    # every 5th feedback id is held out
+HOLDOUT_SIZE    = int(os.environ.get("FEEDBACK_HOLDOUT_SIZE", 500))
+REFRESH_SECONDS = int(os.environ.get("FEEDBACK_REFRESH_SECONDS", 3600))
+SGD_LEARNING_RATE = float(os.environ.get("FEEDBACK_SGD_LR", 0.05))
+
+
+def _sgd_step(model, X, y, lr):
+    """One softmax-gradient step on a fitted multinomial LogisticRegression."""
+    Y = (np.asarray(y)[:, None] == model.classes_[None, :]).astype(np.float64)
+    grad = (model.predict_proba(X) - Y) / len(X)
+    model.coef_ = (model.coef_ - lr * grad.T @ X).astype(model.coef_.dtype)
+    model.intercept_ = (model.intercept_ - lr * grad.sum(axis=0)).astype(model.intercept_.dtype)
+
+
+def _extend_knn(model, X, y):
+    new = clone(model)
+    new.fit(np.vstack([model._fit_X, X]), np.concatenate([model.classes_[model._y], y]))
+    return new
+
+
+class OnlineLearner:
+    """Folds confirmed field outcomes into the serving models.
+
+    Feedback is split by id into a rolling hold-out (every HOLDOUT_EVERY-th
+    sample) and a training stream. The training stream is applied in
+    micro-batches to the models that support cheap updates; the remaining
+    models are refit by refresh() on the original training split plus all
+    stored feedback. Updated models are swapped into ``serving.models`` so
+    in-flight predictions never see a half-updated estimator.
+
+    refresh() also rebuilds the incremental models and the hold-out from the
+    stored rows, so a restarted process (or another worker) catches up with
+    feedback it never saw through add(). The incremental models are rebuilt
+    by replaying the rows through the same cheap updates onto a snapshot of
+    the models as first trained, never refit. Until the first successful
+    refresh the learner counts as not ``replayed`` and a refresh is due.
+    """
+
+    def __init__(self, serving=serving, csv_path=CSV_PATH, batch_size=BATCH_SIZE,
+                 holdout_every=HOLDOUT_EVERY, holdout_size=HOLDOUT_SIZE,
+                 refresh_seconds=REFRESH_SECONDS):
+        self.serving         = serving
+        self.csv_path        = csv_path
+        self.batch_size      = batch_size
+        self.holdout_every   = holdout_every
+        self.refresh_seconds = refresh_seconds
+        self.classes         = set(serving.models["naive_bayes"].classes_)
+        # Replay starts from these, so stored feedback is never applied twice.
+        self._base = {name: copy.deepcopy(serving.models[name]) for name in INCREMENTAL_MODELS}
+
+        self._pending     = []                         # (id, x_scaled, label)
+        self._holdout     = deque(maxlen=holdout_size)  # (id, x_scaled, label)
+        self._unrefreshed = []                         # applied since the last refresh
+        self._unrefit     = 0                          # stored rows the scheduled models lack
+        self._lock      = threading.Lock()
+        self._refreshing   = False
+        self._last_refresh = None
+        self.replayed = False
+        self.rolling_metrics = {}
+
+    @property
+    def samples_since_refresh(self):
+        return self._unrefit + len(self._unrefreshed) + len(self._pending)
+
+    def is_holdout(self, sample_id):
+        return self.holdout_every > 0 and sample_id % self.holdout_every == 0
+
+    def _scale(self, features):
+        return self.serving.scaler.transform(pd.DataFrame(features, columns=FEATURES))
+
+    def add(self, features, label, sample_id):
+        """Queue one confirmed outcome. Returns True if a micro-batch was applied."""
+        x = self._scale([features])[0]
+        with self._lock:
+            if self.is_holdout(sample_id):
+                self._holdout.append((sample_id, x, label))
+                self._evaluate()
+                return False
+            self._pending.append((sample_id, x, label))
+            if len(self._pending) < self.batch_size:
+                return False
+            batch, self._pending = self._pending, []
+            X = np.array([x for _, x, _ in batch])
+            y = np.array([label for _, _, label in batch])
+            self.serving.models.update(self._updated(self.serving.models, X, y))
+            self._unrefreshed.extend(batch)
+            self._evaluate()
+            return True
+
+    def _updated(self, models, X, y):
+        """Copies of the incremental models with (X, y) folded in: NB partial_fit,
+        one SGD step per batch_size rows for LR, and the KNN index extended."""
+        nb = copy.deepcopy(models["naive_bayes"])
+        nb.partial_fit(X, y)
+
+        lr = models["logistic_regression"]
+        if lr.coef_.shape[0] == len(lr.classes_):
+            lr = copy.deepcopy(lr)
+            for start in range(0, len(X), self.batch_size):
+                stop = start + self.batch_size
+                _sgd_step(lr, X[start:stop], y[start:stop], SGD_LEARNING_RATE)
+
+        return {"naive_bayes": nb, "logistic_regression": lr, "knn": _extend_knn(models["knn"], X, y)}
+
+    def _evaluate(self):
+        if not self._holdout:
+            return
+        X = np.array([x for _, x, _ in self._holdout])
+        y = np.array([label for _, _, label in self._holdout])
+        self.rolling_metrics = {
+            name: {"accuracy": round(float((model.predict(X) == y).mean()) * 100, 2), "n": len(y)}
+            for name, model in self.serving.models.items()
+        }
+
+    def refresh_due(self):
+        if self._refreshing:
+            return False
+        if self._last_refresh is None:
+            return True
+        elapsed = time.monotonic() - self._last_refresh
+        if not self.replayed:
+            # Retry a failed startup replay, but not on every request.
+            return elapsed >= min(self.refresh_seconds, 60)
+        return self.samples_since_refresh > 0 and elapsed >= self.refresh_seconds
+
+    def refresh(self, feedback_rows, refit_scheduled=True):
+        """Rebuild the models and the hold-out from the training split plus stored feedback.
+
+        feedback_rows: iterable of (id, [N, P, K, temperature, humidity, ph, rainfall], crop),
+        i.e. everything in crop_feedback. It is consumed inside the refresh,
+        so a generator that queries the database counts as an attempt even
+        if the query fails. Hold-out ids never reach training.
+
+        The scheduled models are refit from scratch unless refit_scheduled
+        is False (the startup replay), in which case the stored rows count
+        towards the next refresh instead. The incremental models are always
+        rebuilt from their snapshot through the incremental updates.
+        Samples added while the refresh runs (ids above the newest stored
+        row) are kept and counted towards the next refresh.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        try:
+            rows = sorted((int(sample_id), list(f), crop) for sample_id, f, crop in feedback_rows
+                          if crop in self.classes)
+            newest_id = rows[-1][0] if rows else 0
+            train_rows = [(f, crop) for sample_id, f, crop in rows if not self.is_holdout(sample_id)]
+            holdout_rows = [(sample_id, f, crop) for sample_id, f, crop in rows if self.is_holdout(sample_id)]
+            holdout_rows = holdout_rows[-self._holdout.maxlen:]
+
+            rebuilt = dict(self._base)
+            if train_rows:
+                X_feedback = self._scale([f for f, _ in train_rows])
+                y_feedback = np.array([crop for _, crop in train_rows])
+                rebuilt = self._updated(rebuilt, X_feedback, y_feedback)
+
+            if refit_scheduled:
+                df = pd.read_csv(self.csv_path)
+                X_train, _, y_train, _ = train_test_split(
+                    df[FEATURES], df['label'], test_size=0.2, random_state=42
+                )
+                if train_rows:
+                    X_train = pd.concat([X_train, pd.DataFrame([f for f, _ in train_rows], columns=FEATURES)])
+                    y_train = pd.concat([y_train, pd.Series([crop for _, crop in train_rows])])
+                X_scaled = self.serving.scaler.transform(X_train)
+                for name in SCHEDULED_MODELS:
+                    model = clone(self.serving.models[name])
+                    model.fit(X_scaled, y_train)
+                    rebuilt[name] = model
+
+            holdout = deque(maxlen=self._holdout.maxlen)
+            if holdout_rows:
+                X_holdout = self._scale([f for _, f, _ in holdout_rows])
+                holdout.extend((sample_id, x, crop) for (sample_id, _, crop), x in zip(holdout_rows, X_holdout))
+
+            with self._lock:
+                # Batches applied while this ran are newer than the stored
+                # rows; fold them into the rebuilt models too.
+                late = [entry for entry in self._unrefreshed if entry[0] > newest_id]
+                if late:
+                    rebuilt.update(self._updated(rebuilt, np.array([x for _, x, _ in late]),
+                                                 np.array([label for _, _, label in late])))
+                self.serving.models.update(rebuilt)
+                holdout.extend(entry for entry in self._holdout if entry[0] > newest_id)
+                self._holdout = holdout
+                self._pending = [entry for entry in self._pending if entry[0] > newest_id]
+                self._unrefreshed = late
+                if refit_scheduled:
+                    self._unrefit = 0
+                elif train_rows:
+                    self._unrefit = len(train_rows)
+                self.replayed = True
+                self._evaluate()
+            return True
+        finally:
+            self._last_refresh = time.monotonic()
+            self._refreshing = False
+
+
+learner = OnlineLearner()
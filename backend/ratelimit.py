@@ -0,0 +1,229 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+# Per-endpoint budgets as "capacity/period_seconds": a bucket holds at most
+# `capacity` tokens and refills capacity/period tokens per second.
+# "user" buckets are keyed by the JWT user_id, "ip" buckets by remote address.
+DEFAULT_BUDGETS = {
+    "predict":              {"user": "30/60", "ip": "60/60"},
+    "explain":              {"user": "10/60", "ip": "20/60"},
+    "auth.login":           {"ip": "10/60"},
+    "auth.forgot_password": {"ip": "5/900"},
+}
+# Endpoints that run model inference share one concurrency cap.
+INFERENCE_ENDPOINTS = ("predict", "explain")
+
+MAX_INFLIGHT_INFERENCE = int(os.environ.get("MAX_INFLIGHT_INFERENCE", os.cpu_count() or 4))
+INFERENCE_WAIT_SECONDS = float(os.environ.get("INFERENCE_WAIT_SECONDS", 0.5))
+RATE_LIMIT_REDIS_URL   = os.environ.get("RATE_LIMIT_REDIS_URL")
+# Number of reverse proxies in front of the app. Behind a proxy every client
+# shares the proxy's address (and so one /login bucket) unless this is set;
+# with it set, the address comes from that many X-Forwarded-For hops. Leave
+# it at 0 when clients reach the app directly, or they can spoof the header.
+TRUSTED_PROXIES        = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", 0))
+
+
+def parse_budget(spec):
+    capacity, period = spec.split("/")
+    capacity = int(capacity)
+    return capacity, capacity / float(period)
+
+
+class MemoryBackend:
+    """Token buckets in an LRU-ordered dict; the least recently used bucket is
+    dropped once there are more than max_keys (it would have refilled anyway
+    unless its client is unusually persistent)."""
+
+    def __init__(self, max_keys=100_000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_keys = max_keys
+
+    def take(self, key, capacity, rate, now=None):
+        allowed, tokens = self.take_all([(key, capacity, rate)], now)
+        return allowed, tokens[0]
+
+    def take_all(self, buckets, now=None):
+        """Take one token from every (key, capacity, rate) bucket, or from none
+        of them if any is empty. Returns (allowed, tokens left per bucket)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            levels = []
+            for key, capacity, rate in buckets:
+                tokens, last = self._buckets.get(key, (capacity, now))
+                levels.append(min(capacity, tokens + (now - last) * rate))
+            allowed = all(tokens >= 1 for tokens in levels)
+            if allowed:
+                levels = [tokens - 1 for tokens in levels]
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self._max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, levels
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    """Shared token buckets for multi-process deployments (needs `redis`)."""
+
+    # KEYS are the buckets; ARGV is now followed by capacity, rate per key.
+    SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local levels = {}
+    local allowed = 1
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[2 * i])
+        local rate     = tonumber(ARGV[2 * i + 1])
+        local state    = redis.call('HMGET', key, 'tokens', 'last')
+        local tokens   = tonumber(state[1]) or capacity
+        local last     = tonumber(state[2]) or now
+        levels[i] = math.min(capacity, tokens + math.max(0, now - last) * rate)
+        if levels[i] < 1 then
+            allowed = 0
+        end
+    end
+    local result = {allowed}
+    for i, key in ipairs(KEYS) do
+        local capacity = tonumber(ARGV[2 * i])
+        local rate     = tonumber(ARGV[2 * i + 1])
+        levels[i] = levels[i] - allowed
+        redis.call('HSET', key, 'tokens', levels[i], 'last', now)
+        redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+        result[i + 1] = tostring(levels[i])
+    end
+    return result
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the `redis` package is not installed.")
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, rate, now=None):
+        allowed, tokens = self.take_all([(key, capacity, rate)], now)
+        return allowed, tokens[0]
+
+    def take_all(self, buckets, now=None):
+        now = time.time() if now is None else now
+        args = [now]
+        for _, capacity, rate in buckets:
+            args.extend([capacity, rate])
+        result = self._script(keys=[f"ratelimit:{key}" for key, _, _ in buckets], args=args)
+        return bool(result[0]), [float(tokens) for tokens in result[1:]]
+
+    def reset(self):
+        for key in self._client.scan_iter("ratelimit:*"):
+            self._client.delete(key)
+
+
+class RateLimiter:
+    """Per-route token buckets plus a global cap on in-flight inference.
+
+    Hooks into the app with before/after/teardown request handlers, so
+    blueprints need no changes. Over-budget requests get 429, and requests
+    that cannot get an inference slot within INFERENCE_WAIT_SECONDS get 503.
+    Both carry Retry-After. Limited routes always get RateLimit-Limit,
+    RateLimit-Remaining and RateLimit-Reset headers.
+
+    With trusted_proxies > 0 the app is wrapped in werkzeug's ProxyFix so
+    request.remote_addr (and the ip buckets) is the real client address.
+    """
+
+    def __init__(self, app=None, user_getter=None, budgets=None, backend=None,
+                 max_inflight=MAX_INFLIGHT_INFERENCE, inference_wait=INFERENCE_WAIT_SECONDS,
+                 trusted_proxies=TRUSTED_PROXIES):
+        self.user_getter = user_getter or (lambda: None)
+        self.budgets = {
+            endpoint: {scope: parse_budget(spec) for scope, spec in scopes.items()}
+            for endpoint, scopes in (budgets or DEFAULT_BUDGETS).items()
+        }
+        if backend is None:
+            backend = RedisBackend(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryBackend()
+        self.backend = backend
+        self.inference_wait = inference_wait
+        self.trusted_proxies = trusted_proxies
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if self.trusted_proxies:
+            app.wsgi_app = ProxyFix(app.wsgi_app, x_for=self.trusted_proxies)
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def reset(self):
+        self.backend.reset()
+
+    def _keys(self, endpoint):
+        scopes = self.budgets.get(endpoint, {})
+        keys = []
+        if "user" in scopes:
+            user = self.user_getter()
+            if user and user.get("user_id") is not None:
+                keys.append((f"{endpoint}:user:{user['user_id']}", *scopes["user"]))
+        if "ip" in scopes:
+            keys.append((f"{endpoint}:ip:{request.remote_addr}", *scopes["ip"]))
+        return keys
+
+    def _before(self):
+        endpoint = request.endpoint
+        if request.method == "OPTIONS" or endpoint not in self.budgets:
+            return None
+
+        # All buckets are charged together, so a request denied by one
+        # bucket (say the IP) does not spend tokens from the others.
+        buckets = self._keys(endpoint)
+        allowed, levels = self.backend.take_all(buckets)
+        states = [
+            {
+                "limit":     capacity,
+                "remaining": max(int(tokens), 0),
+                "reset":     math.ceil((capacity - tokens) / rate),
+                "retry":     math.ceil((1 - tokens) / rate) if tokens < 1 else 0,
+            }
+            for (_, capacity, rate), tokens in zip(buckets, levels)
+        ]
+        # Report the bucket that blocks longest, else the one closest to empty.
+        tightest = max(states, key=lambda st: (st["retry"], -st["remaining"]), default=None)
+        g.rate_limit = tightest
+        if not allowed:
+            response = jsonify({"error": "Too many requests, slow down"})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(max(tightest["retry"], 1))
+            return response
+
+        if endpoint in INFERENCE_ENDPOINTS:
+            if not self._inflight.acquire(timeout=self.inference_wait):
+                response = jsonify({"error": "Server busy, try again shortly"})
+                response.status_code = 503
+                response.headers["Retry-After"] = "1"
+                return response
+            g.inference_slot = True
+        return None
+
+    def _after(self, response):
+        state = g.pop("rate_limit", None)
+        if state:
+            response.headers["RateLimit-Limit"]     = str(state["limit"])
+            response.headers["RateLimit-Remaining"] = str(state["remaining"])
+            response.headers["RateLimit-Reset"]     = str(state["reset"])
+        return response
+
+    def _teardown(self, exc):
+        if g.pop("inference_slot", False):
+            self._inflight.release()
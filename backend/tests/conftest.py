@@ -1,8 +1,13 @@
+import os
 import pytest
-from app import app
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from app import app, limiter
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
+    limiter.reset()
     with app.test_client() as client:
         yield client
@@ -13,6 +13,8 @@ def fake_db(monkeypatch, rows=None, raise_error=False):
         def execute(self, *args, **kwargs):
             if raise_error:
                 raise Exception("db failure")
+        def fetchone(self):
+            return {"version": 0}
         def fetchall(self):
             return self._rows
         def close(self):
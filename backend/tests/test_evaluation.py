@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+from sklearn.naive_bayes import GaussianNB
+from sklearn.tree import DecisionTreeClassifier
+import evaluation
+import ml_core
+
+
+def _small_csv(tmp_path):
+    df = pd.read_csv(ml_core.CSV_PATH).groupby("label").head(10)
+    path = tmp_path / "crops.csv"
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_cross_validation_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(evaluation, "CACHE_DIR", str(tmp_path / "cache"))
+    csv_path = _small_csv(tmp_path)
+    models = {"naive_bayes": GaussianNB(), "decision_tree": DecisionTreeClassifier(random_state=42)}
+
+    first = evaluation.evaluate_models(csv_path, models, k=2, n_jobs=1)
+    assert len(os.listdir(tmp_path / "cache")) == 4
+    second = evaluation.evaluate_models(csv_path, models, k=2, n_jobs=1)
+    assert second["models"]["naive_bayes"]["fold_accuracies"] == first["models"]["naive_bayes"]["fold_accuracies"]
+    assert len(os.listdir(tmp_path / "cache")) == 4
+
+    nb = first["models"]["naive_bayes"]
+    assert len(nb["fold_accuracies"]) == 2
+    assert sum(c["support"] for c in nb["per_class"].values()) == 220
+    assert nb["single_row_ms"] > 0
+
+
+def test_select_best_model_prefers_stable_and_cheap():
+    report = {"models": {
+        "noisy":  {"accuracy_mean": 99.0, "accuracy_std": 3.0, "single_row_ms": 0.1},
+        "slow":   {"accuracy_mean": 98.5, "accuracy_std": 0.2, "single_row_ms": 9.0},
+        "fast":   {"accuracy_mean": 98.3, "accuracy_std": 0.2, "single_row_ms": 0.2},
+    }}
+    assert evaluation.select_best_model(report) == "fast"
+
+
+def test_load_report_ignores_other_datasets(tmp_path):
+    csv_path = _small_csv(tmp_path)
+    report_path = str(tmp_path / "report.json")
+    evaluation.save_report({"dataset_hash": "stale", "models": {}}, report_path)
+    assert evaluation.load_report(csv_path, report_path) is None
+    evaluation.save_report({"dataset_hash": evaluation.dataset_hash(csv_path), "models": {}}, report_path)
+    assert evaluation.load_report(csv_path, report_path) is not None
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import ml_core
+from explain import explain_batch, tree_contributions, EXPLAINED_MODELS
+
+SAMPLE = {"N": 90, "P": 40, "K": 40, "temperature": 25, "humidity": 80, "ph": 6.5, "rainfall": 200}
+
+
+def test_tree_contributions_are_exact():
+    df = pd.read_csv(ml_core.CSV_PATH).head(50)
+    X = ml_core.scaler.transform(df[ml_core.FEATURES])
+    for name in ("random_forest", "decision_tree"):
+        model = ml_core.models[name]
+        idx = np.searchsorted(model.classes_, model.predict(X))
+        contrib, bias = tree_contributions(model, X, idx)
+        proba = model.predict_proba(X)[np.arange(len(X)), idx]
+        assert np.allclose(contrib.sum(axis=1) + bias, proba)
+
+
+def test_explain_batch_shapes():
+    X = ml_core.scaler.transform(pd.DataFrame([SAMPLE] * 3, columns=ml_core.FEATURES))
+    out = explain_batch(X, ["rice"] * 3)
+    assert set(out) == set(EXPLAINED_MODELS)
+    assert all(v.shape == (3, len(ml_core.FEATURES)) for v in out.values())
+
+
+def test_linear_contributions_are_relative_to_median():
+    median = ml_core.serving.background["median"]
+    assert np.abs(median).max() > 0.1
+    out = explain_batch(median[None, :].astype(np.float64), ["rice"])
+    assert np.allclose(out["logistic_regression"], 0, atol=1e-6)
+
+
+def test_predict_with_explanation(client):
+    response = client.post('/predict', json={**SAMPLE, "explain": True})
+    assert response.status_code == 200
+    explanation = response.get_json()["explanation"]
+    assert set(explanation["random_forest"]) == set(ml_core.FEATURES)
+    assert len(explanation["top_features"]) == 3
+    best_model = ml_core.serving.best_model
+    expected = best_model if best_model in EXPLAINED_MODELS else "random_forest"
+    assert explanation["ranked_by"] == expected
+
+
+def test_explain_batch_endpoint(client):
+    response = client.post('/explain', json={"samples": [SAMPLE, SAMPLE]})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+    assert client.post('/explain', json={"samples": [{"N": 1}]}).status_code == 400
@@ -0,0 +1,91 @@
+import pytest
+import ml_core
+from online import OnlineLearner
+
+SAMPLE = [90, 40, 40, 25, 80, 6.5, 200]
+
+
+@pytest.fixture
+def learner(monkeypatch):
+    # work on a copy of the model dict so tests don't leak updates
+    monkeypatch.setattr(ml_core.serving, "models", dict(ml_core.serving.models))
+    return OnlineLearner(serving=ml_core.serving, batch_size=2, holdout_every=3, refresh_seconds=0)
+
+
+def test_holdout_split_by_id(learner):
+    assert learner.add(SAMPLE, "rice", sample_id=3) is False
+    assert learner.samples_since_refresh == 0
+    assert learner.rolling_metrics["naive_bayes"]["n"] == 1
+
+
+def test_micro_batch_swaps_incremental_models(learner):
+    before = {name: learner.serving.models[name] for name in ("naive_bayes", "knn", "random_forest")}
+    knn_size = before["knn"]._fit_X.shape[0]
+    assert learner.add(SAMPLE, "rice", sample_id=1) is False
+    assert learner.add(SAMPLE, "rice", sample_id=2) is True
+    models = learner.serving.models
+    assert models["naive_bayes"] is not before["naive_bayes"]
+    assert models["knn"]._fit_X.shape[0] == knn_size + 2
+    assert models["random_forest"] is before["random_forest"]
+    assert learner.refresh_due()
+
+
+def test_refresh_refits_scheduled_models(learner):
+    rf = learner.serving.models["random_forest"]
+    assert learner.refresh([(1, SAMPLE, "rice"), (3, SAMPLE, "maize")]) is True
+    assert learner.serving.models["random_forest"] is not rf
+    assert not learner.refresh_due()
+
+
+def test_refresh_replays_stored_feedback(learner):
+    # a fresh process: nothing seen through add(), everything in the table
+    nb, knn = learner.serving.models["naive_bayes"], learner.serving.models["knn"]
+    knn_size = knn._fit_X.shape[0]
+    assert learner.refresh_due() and not learner.replayed
+    learner.add(SAMPLE, "rice", sample_id=7)          # arrives during the replay
+    stored = [(1, SAMPLE, "rice"), (2, SAMPLE, "rice"), (3, SAMPLE, "maize"), (6, SAMPLE, "rice")]
+    assert learner.refresh(stored) is True
+    assert learner.replayed
+    assert learner.serving.models["naive_bayes"] is not nb
+    # hold-out ids 3 and 6 are seeded, not trained on
+    assert learner.rolling_metrics["naive_bayes"]["n"] == 2
+    assert learner.serving.models["knn"]._fit_X.shape[0] == knn_size + 2
+    assert learner.samples_since_refresh == 1
+
+
+def test_startup_replay_skips_scheduled_refit(learner):
+    rf, knn = learner.serving.models["random_forest"], learner.serving.models["knn"]
+    stored = [(1, SAMPLE, "rice"), (2, SAMPLE, "rice")]
+    assert learner.refresh(stored, refit_scheduled=False) is True
+    assert learner.serving.models["random_forest"] is rf
+    assert learner.samples_since_refresh == 2
+    # replaying again starts from the snapshot, so rows are not applied twice
+    learner.refresh(stored, refit_scheduled=False)
+    assert learner.serving.models["knn"]._fit_X.shape[0] == knn._fit_X.shape[0] + 2
+
+
+def test_failed_load_counts_as_attempt():
+    learner = OnlineLearner(serving=ml_core.serving, refresh_seconds=3600)
+
+    def broken():
+        raise ConnectionError("no database")
+        yield
+
+    assert learner.refresh_due()
+    with pytest.raises(ConnectionError):
+        learner.refresh(broken())
+    assert not learner.refresh_due()
+    assert not learner.replayed
+
+
+def test_feedback_unauthorized(client):
+    response = client.post('/feedback', json={})
+    assert response.status_code == 401
+
+
+def test_feedback_unknown_crop(client, monkeypatch):
+    monkeypatch.setattr("feedback.get_current_user", lambda: {"user_id": 1})
+    payload = dict(zip(ml_core.FEATURES, SAMPLE), actual_crop="tomato")
+    response = client.post('/feedback', json=payload)
+    assert response.status_code == 400
+    assert "Unknown crop" in response.get_json()["error"]
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+import pytest
+
+
+class FakeDB:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+        self.version = 1
+        self.queries = []
+
+    def connect(self):
+        db = self
+
+        class Cursor:
+            def execute(self, sql, params=()):
+                db.queries.append((sql, params))
+            def fetchone(self):
+                return {"version": db.version}
+            def fetchall(self):
+                return [dict(r) for r in db.rows]
+            def close(self):
+                pass
+
+        class Conn:
+            def cursor(self, **kwargs):
+                return Cursor()
+            def close(self):
+                pass
+
+        return Conn()
+
+
+def _rows(n):
+    start = datetime(2024, 1, 1)
+    return [{"id": 100 - i, "predicted_crop": "rice", "created_at": start - timedelta(hours=i)}
+            for i in range(n)]
+
+
+@pytest.fixture
+def user_client(monkeypatch, client):
+    monkeypatch.setattr("app.get_current_user", lambda: {"user_id": 1})
+    return client
+
+
+def test_history_requires_owner(client, monkeypatch):
+    assert client.get('/history/1').status_code == 401
+    monkeypatch.setattr("app.get_current_user", lambda: {"user_id": 2})
+    assert client.get('/history/1').status_code == 403
+
+
+def test_history_keyset_pagination(user_client, monkeypatch):
+    db = FakeDB(_rows(3))
+    monkeypatch.setattr("app.get_db_connection", db.connect)
+    response = user_client.get('/history/1?limit=2&crop=Rice&from=2023-12-01')
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+    cursor = response.headers["X-Next-Cursor"]
+    assert 'rel="next"' in response.headers["Link"]
+
+    sql, params = db.queries[-1]
+    assert "ORDER BY created_at DESC, id DESC LIMIT %s" in sql
+    assert params == (1, datetime(2023, 12, 1), "rice", 3)
+
+    user_client.get(f'/history/1?limit=2&cursor={cursor}')
+    sql, params = db.queries[-1]
+    assert "id < %s" in sql
+    assert params[-2] == 99
+
+
+def test_history_bad_cursor(user_client):
+    assert user_client.get('/history/1?cursor=not-a-cursor').status_code == 400
+
+
+def test_history_without_limit_returns_everything(user_client, monkeypatch):
+    db = FakeDB(_rows(60))
+    monkeypatch.setattr("app.get_db_connection", db.connect)
+    response = user_client.get('/history/1')
+    assert len(response.get_json()) == 60
+    assert "X-Next-Cursor" not in response.headers
+    assert "LIMIT" not in db.queries[-1][0]
+
+
+def test_history_etag_follows_version(user_client, monkeypatch):
+    db = FakeDB(_rows(1))
+    monkeypatch.setattr("app.get_db_connection", db.connect)
+    etag = user_client.get('/history/1?limit=10').headers["ETag"]
+
+    response = user_client.get('/history/1?limit=10', headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    sql, params = db.queries[-1]
+    assert "prediction_history_versions" in sql and params == (1,)   # page query skipped
+
+    db.rows.append({"id": 101, "predicted_crop": "maize", "created_at": datetime(2024, 1, 2)})
+    db.version += 1                                                   # bumped by the insert trigger
+    response = user_client.get('/history/1?limit=10', headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+
+def test_history_page_query_is_bounded(user_client, monkeypatch):
+    db = FakeDB(_rows(3))
+    monkeypatch.setattr("app.get_db_connection", db.connect)
+    user_client.get('/history/1?limit=2')
+    assert [sql for sql, _ in db.queries if "COUNT" in sql or "MAX(" in sql] == []
+    assert db.queries[-1][0].endswith("LIMIT %s")
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import ml_core
+from ml_core import train_serving_models, predict_crop, FEATURES
+
+
+def test_serving_drops_training_frames():
+    for name in ("df", "X", "y", "X_train", "X_test", "X_train_scaled", "X_test_scaled"):
+        assert not hasattr(ml_core, name)
+    assert ml_core.serving.training is None
+
+
+def test_memory_report_shows_released_data():
+    report = ml_core.serving.memory_report()
+    assert set(report["released"]) >= {"df", "X_train", "X_train_scaled"}
+    assert report["released_total"] > 0
+    assert not any(key.startswith("training.") for key in report["retained"])
+    assert ml_core.scaler.mean_.dtype == np.float32
+
+
+def test_memory_report_covers_compaction_and_knn_index():
+    report = ml_core.serving.memory_report()
+    for name in ("scaler", "models.logistic_regression", "models.naive_bayes"):
+        sizes = report["compaction"][name]
+        assert sizes["after"] <= sizes["before"]
+    assert report["compaction"]["scaler"]["after"] < report["compaction"]["scaler"]["before"]
+    assert report["retained_training_data"]["models.knn._fit_X"] == ml_core.models["knn"]._fit_X.nbytes
+
+
+def test_diagnostic_mode_keeps_training_data():
+    diag = train_serving_models(keep_training_data=True)
+    assert diag.training["X_train"].shape[1] == len(FEATURES)
+    assert diag.accuracies == ml_core.accuracies
+    assert any(key.startswith("training.") for key in diag.memory_report()["retained"])
+
+
+def test_predict_crop_after_compaction():
+    df = pd.DataFrame([[90, 40, 40, 25, 80, 6.5, 200]], columns=FEATURES)
+    preds, _, best, rec, _ = predict_crop(df)
+    assert rec in preds.values()
+    assert best in ml_core.models
+
+
+def test_cv_report_drives_best_model_and_reported_accuracies():
+    cv_report = {"best_model": "svm", "models": {
+        name: {"accuracy_mean": 90.0 + i, "accuracy_std": 0.5, "single_row_ms": 1.0}
+        for i, name in enumerate(ml_core.models)
+    }}
+    container = ml_core.ServingModels(ml_core.scaler, ml_core.models, ml_core.model_metrics,
+                                      cv_report=cv_report)
+    assert container.best_model == "svm"
+    assert container.accuracy_source == "cross_validation"
+    assert container.reported_accuracies["svm"] == cv_report["models"]["svm"]["accuracy_mean"]
+    assert ml_core.serving.cv_metrics is None or ml_core.serving.accuracy_source == "cross_validation"
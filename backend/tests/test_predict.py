@@ -21,3 +21,4 @@ def test_predict(auth_client):
     assert response.status_code == 200
     json_data = response.get_json()
     assert "recommended_crop" in json_data
+    assert json_data["accuracy_source"] in ("cross_validation", "holdout_split")
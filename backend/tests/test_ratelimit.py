@@ -0,0 +1,125 @@
+import threading
+import pytest
+from flask import Flask, jsonify
+from ratelimit import MemoryBackend, RateLimiter
+
+
+def make_app(budgets, user=None, max_inflight=4, hold=None, started=None, trusted_proxies=0):
+    app = Flask(__name__)
+
+    @app.route('/predict', methods=['POST'])
+    def predict():
+        if started:
+            started.set()
+        if hold:
+            hold.wait(2)
+        return jsonify({"ok": True})
+
+    @app.route('/login', methods=['POST'])
+    def login():
+        return jsonify({"ok": True})
+
+    app.limiter = RateLimiter(app, user_getter=lambda: user, budgets=budgets,
+                              max_inflight=max_inflight, inference_wait=0.01,
+                              trusted_proxies=trusted_proxies)
+    return app
+
+
+def test_token_bucket_refills():
+    backend = MemoryBackend()
+    assert backend.take("k", 2, 1.0, now=0)[0]
+    assert backend.take("k", 2, 1.0, now=0)[0]
+    assert not backend.take("k", 2, 1.0, now=0)[0]
+    assert backend.take("k", 2, 1.0, now=1.0)[0]
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_keys=2)
+    backend.take("a", 1, 0.001, now=0)
+    backend.take("b", 1, 0.001, now=0)
+    backend.take("a", 1, 0.001, now=0)     # refreshes "a"
+    backend.take("c", 1, 0.001, now=0)     # evicts "b"
+    assert backend.take("b", 1, 0.001, now=0)[0]
+    assert not backend.take("c", 1, 0.001, now=0)[0]
+
+
+def test_denied_request_spends_no_tokens():
+    backend = MemoryBackend()
+    buckets = [("user", 5, 0.001), ("ip", 1, 0.001)]
+    assert backend.take_all(buckets, now=0)[0]
+    allowed, levels = backend.take_all(buckets, now=0)
+    assert not allowed
+    assert levels[0] == 4
+
+
+def test_ip_denial_keeps_user_budget():
+    budgets = {"predict": {"user": "2/60", "ip": "1/60"}}
+    app = make_app(budgets, user={"user_id": 7})
+    client = app.test_client()
+    assert client.post('/predict').status_code == 200
+    blocked = client.post('/predict')
+    assert blocked.status_code == 429
+    assert blocked.headers["RateLimit-Limit"] == "1"
+    other_ip = app.test_client().post('/predict', environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert other_ip.status_code == 200
+    assert other_ip.headers["RateLimit-Remaining"] == "0"
+
+
+def test_ip_budget_returns_429_with_headers():
+    client = make_app({"login": {"ip": "2/60"}}).test_client()
+    first = client.post('/login')
+    assert first.headers["RateLimit-Limit"] == "2"
+    assert first.headers["RateLimit-Remaining"] == "1"
+    client.post('/login')
+    blocked = client.post('/login')
+    assert blocked.status_code == 429
+    assert int(blocked.headers["Retry-After"]) >= 1
+
+
+def test_forwarded_address_behind_trusted_proxy():
+    proxy = {"REMOTE_ADDR": "10.0.0.1"}
+    client = make_app({"login": {"ip": "1/60"}}, trusted_proxies=1).test_client()
+    assert client.post('/login', environ_base=proxy, headers={"X-Forwarded-For": "203.0.113.5"}).status_code == 200
+    assert client.post('/login', environ_base=proxy, headers={"X-Forwarded-For": "203.0.113.5"}).status_code == 429
+    assert client.post('/login', environ_base=proxy, headers={"X-Forwarded-For": "198.51.100.7"}).status_code == 200
+
+    # without a trusted proxy the header is ignored, so it cannot be spoofed
+    direct = make_app({"login": {"ip": "1/60"}}).test_client()
+    assert direct.post('/login', headers={"X-Forwarded-For": "203.0.113.5"}).status_code == 200
+    assert direct.post('/login', headers={"X-Forwarded-For": "198.51.100.7"}).status_code == 429
+
+
+def test_user_budget_is_separate_from_ip():
+    budgets = {"predict": {"user": "1/60", "ip": "10/60"}}
+    client = make_app(budgets, user={"user_id": 7}).test_client()
+    assert client.post('/predict').status_code == 200
+    assert client.post('/predict').status_code == 429
+    anon = make_app(budgets).test_client()
+    assert anon.post('/predict').status_code == 200
+    assert anon.post('/predict').status_code == 200
+
+
+def test_inference_concurrency_cap():
+    hold, started = threading.Event(), threading.Event()
+    app = make_app({"predict": {"ip": "100/60"}}, max_inflight=1, hold=hold, started=started)
+    results = []
+    worker = threading.Thread(target=lambda: results.append(app.test_client().post('/predict').status_code))
+    worker.start()
+    assert started.wait(2)
+    busy = app.test_client().post('/predict')
+    hold.set()
+    worker.join()
+    assert busy.status_code == 503
+    assert results == [200]
+    assert app.test_client().post('/predict').status_code == 200
+
+
+@pytest.mark.parametrize("path, capacity", [("/login", 10), ("/forgot_password", 5)])
+def test_auth_endpoints_are_limited(client, path, capacity):
+    # Empty bodies fail validation before the database is touched.
+    for remaining in range(capacity - 1, -1, -1):
+        response = client.post(path, json={})
+        assert response.status_code == 400
+        assert response.headers["RateLimit-Limit"] == str(capacity)
+        assert response.headers["RateLimit-Remaining"] == str(remaining)
+    assert client.post(path, json={}).status_code == 429
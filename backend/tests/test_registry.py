@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+import pandas as pd
+import pytest
+import ml_core
+from ml_core import ModelRegistry, UnknownModelSet, save_model_set
+
+SAMPLE = {"N": 90, "P": 40, "K": 40, "temperature": 25, "humidity": 80, "ph": 6.5, "rainfall": 200}
+
+
+@pytest.fixture
+def store(tmp_path):
+    for name in ("north", "south", "east"):
+        save_model_set(ml_core.serving, name, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_registry_lru_bound(store):
+    registry = ModelRegistry(ml_core.serving, store=store, max_resident=2)
+    assert registry.resident() == ["default"]
+    north = registry.get("north")
+    registry.get("south")
+    assert registry.get("north") is north
+    registry.get("east")
+    assert registry.resident() == ["default", "north", "east"]
+    assert registry.get() is ml_core.serving
+    assert registry.available() == ["default", "east", "north", "south"]
+
+
+def test_registry_rejects_unknown_names(store):
+    registry = ModelRegistry(ml_core.serving, store=store)
+    with pytest.raises(UnknownModelSet):
+        registry.get("west")
+    with pytest.raises(UnknownModelSet):
+        registry.get("../north")
+
+
+def test_registry_never_trains_in_request(tmp_path):
+    df = pd.read_csv(ml_core.CSV_PATH).groupby("label").head(10)
+    df.to_csv(tmp_path / "v2.csv", index=False)
+    registry = ModelRegistry(ml_core.serving, store=str(tmp_path))
+    with pytest.raises(UnknownModelSet):
+        registry.get("v2")
+    assert not os.path.exists(tmp_path / "v2.pkl")
+    assert registry.available() == ["default"]
+
+
+def test_registry_unknown_names_leave_no_state(store):
+    registry = ModelRegistry(ml_core.serving, store=store)
+    for i in range(5):
+        with pytest.raises(UnknownModelSet):
+            registry.get(f"nope{i}")
+    with pytest.raises(UnknownModelSet):
+        registry.get(5)
+    registry.get("north")
+    assert registry._loading == {}
+
+
+def test_registry_loads_each_set_once_at_a_time(store):
+    loading, overlap = {}, []
+
+    class SlowRegistry(ModelRegistry):
+        def _load(self, name):
+            loading[name] = loading.get(name, 0) + 1
+            overlap.append(loading[name])
+            time.sleep(0.005)
+            loading[name] -= 1
+            return super()._load(name)
+
+    # one resident slot, so sets are evicted while others wait on them
+    registry = SlowRegistry(ml_core.serving, store=store, max_resident=1)
+    names = ["north", "south", "east"]
+    workers = [threading.Thread(target=lambda i=i: [registry.get(names[(i + j) % 3]) for j in range(40)])
+               for i in range(24)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert max(overlap) == 1
+    assert registry._loading == {}
+
+
+def test_predict_with_model_set(client, monkeypatch, store):
+    monkeypatch.setattr(ml_core, "registry", ModelRegistry(ml_core.serving, store=store))
+    monkeypatch.setattr("app.registry", ml_core.registry)
+    response = client.post('/predict', json={**SAMPLE, "model_set": "north"})
+    assert response.status_code == 200
+    assert response.get_json()["model_set"] == "north"
+
+    df = pd.DataFrame([SAMPLE], columns=ml_core.FEATURES)
+    assert ml_core.predict_crop(df, model_set="south")[3] == ml_core.predict_crop(df)[3]
+
+    response = client.post('/predict', json={**SAMPLE, "model_set": "west"})
+    assert response.status_code == 404
+    assert client.post('/predict', json={**SAMPLE, "model_set": 5}).status_code == 400
+    assert client.post('/explain', json={"samples": [SAMPLE], "model_set": ["a"]}).status_code == 400
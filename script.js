@@ -146,7 +146,8 @@ function buildResultsTable(pred) {
 
   const tbody = rows.map(([label, key]) => {
     const crop       = pred.predictions[key] || "—";
-    const accuracy   = pred.accuracies[key]  || "—";
+    const accuracy   = (pred.accuracies[key] || "—") + "%" +
+      (pred.cv_metrics && pred.cv_metrics[key] ? ` ± ${pred.cv_metrics[key].accuracy_std}` : "");
     const confidence = pred.confidence_scores && pred.confidence_scores[key] != null
       ? pred.confidence_scores[key] + "%"
       : "—";
@@ -155,7 +156,7 @@ function buildResultsTable(pred) {
     return `<tr style="${isBest ? 'background:#e8f5e9; font-weight:700;' : ''}">
       <td>${label} ${isBest ? '⭐' : ''}</td>
       <td>${crop}</td>
-      <td>${accuracy}%</td>
+      <td>${accuracy}</td>
       <td>${confidence}</td>
     </tr>`;
   }).join("");
@@ -0,0 +1,28 @@
+USE crop_system;
+
+-- ─────────────────────────────────────────────────────────────
+-- Crop Feedback Table
+-- Confirmed field outcomes used for online model updates
+-- ─────────────────────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS crop_feedback (
+    id              INT AUTO_INCREMENT PRIMARY KEY,
+    user_id         INT         NOT NULL,
+    prediction_id   INT         NULL,      -- prediction being confirmed, if known
+
+    -- Soil inputs
+    nitrogen        FLOAT       NOT NULL,
+    phosphorus      FLOAT       NOT NULL,
+    potassium       FLOAT       NOT NULL,
+    temperature     FLOAT       NOT NULL,
+    humidity        FLOAT       NOT NULL,
+    ph              FLOAT       NOT NULL,
+    rainfall        FLOAT       NOT NULL,
+
+    -- Crop the farmer confirmed actually succeeded
+    actual_crop     VARCHAR(50) NOT NULL,
+
+    created_at      DATETIME    DEFAULT CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (user_id)       REFERENCES users(id)       ON DELETE CASCADE,
+    FOREIGN KEY (prediction_id) REFERENCES predictions(id) ON DELETE SET NULL
+);
@@ -0,0 +1,55 @@
+USE crop_system;
+
+-- ─────────────────────────────────────────────────────────────
+-- Prediction History Indexes
+-- /history/<user_id> pages with
+--   WHERE user_id = ? [AND created_at range] [AND predicted_crop = ?]
+--   ORDER BY created_at DESC, id DESC LIMIT n
+-- and seeks past the last (created_at, id) of the previous page.
+-- Run once; MySQL has no CREATE INDEX IF NOT EXISTS.
+-- ─────────────────────────────────────────────────────────────
+CREATE INDEX idx_predictions_user_created
+    ON predictions (user_id, created_at, id);
+
+-- Same ordering when the history is filtered to one crop
+CREATE INDEX idx_predictions_user_crop_created
+    ON predictions (user_id, predicted_crop, created_at, id);
+
+-- ─────────────────────────────────────────────────────────────
+-- Prediction History Versions
+-- One counter per user, bumped by the triggers below on every
+-- write to predictions (from the app or anywhere else). The
+-- history ETag is built from it, so a 304 costs one primary-key
+-- lookup instead of a query over the user's predictions.
+-- Rows cascaded away with their user fire no triggers, but the
+-- user's counter goes with them.
+-- ─────────────────────────────────────────────────────────────
+CREATE TABLE IF NOT EXISTS prediction_history_versions (
+    user_id     INT     PRIMARY KEY,
+    version     BIGINT  NOT NULL DEFAULT 0,
+
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TRIGGER trg_predictions_history_insert AFTER INSERT ON predictions
+FOR EACH ROW
+    INSERT INTO prediction_history_versions (user_id, version) VALUES (NEW.user_id, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+CREATE TRIGGER trg_predictions_history_delete AFTER DELETE ON predictions
+FOR EACH ROW
+    INSERT INTO prediction_history_versions (user_id, version) VALUES (OLD.user_id, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+
+DELIMITER //
+CREATE TRIGGER trg_predictions_history_update AFTER UPDATE ON predictions
+FOR EACH ROW
+BEGIN
+    INSERT INTO prediction_history_versions (user_id, version) VALUES (NEW.user_id, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1;
+    IF OLD.user_id <> NEW.user_id THEN
+        INSERT INTO prediction_history_versions (user_id, version) VALUES (OLD.user_id, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1;
+    END IF;
+END//
+DELIMITER ;